@@ -7,16 +7,56 @@ from flask import Flask, request, jsonify, render_template, Response
 import cv2
 import numpy as np
 import base64
-from PIL import Image
-import io
 import os
-from datetime import datetime
+import queue
+import threading
+import time
 
 app = Flask(__name__)
 
-# Đường dẫn lưu ảnh đã nhận diện
+# Thư mục chứa file tĩnh (Haar Cascade, model YuNet)
 STATIC_DIR = 'static'
-DETECTED_IMAGE_PATH = os.path.join(STATIC_DIR, 'face_detected.jpg')
+
+# Chiều rộng ảnh dùng để nhận diện (ảnh lớn hơn sẽ được thu nhỏ trước)
+DETECTION_WIDTH = 320
+
+# Tỉ lệ thu nhỏ khi decode JPEG để nhận diện (khớp với IMREAD_REDUCED_*_2)
+DETECTION_DECODE_SCALE = 2
+
+# Chỉ chạy nhận diện đầy đủ mỗi DETECT_EVERY_N_FRAMES frame, các frame ở giữa
+# dùng lại vị trí khuôn mặt cũ. Kết quả cũ hơn DETECTION_MAX_AGE giây luôn được
+# tính lại, nên khi ESP32-CAM gửi chậm thì frame nào cũng được nhận diện
+DETECT_EVERY_N_FRAMES = 5
+DETECTION_MAX_AGE = 0.5
+
+# Tham số encode JPEG cho stream: chất lượng 70, tắt tối ưu Huffman và progressive
+# (chế độ nhanh nhất của libjpeg-turbo, đủ cho ảnh giám sát)
+JPEG_ENCODE_PARAMS = [
+    int(cv2.IMWRITE_JPEG_QUALITY), 70,
+    int(cv2.IMWRITE_JPEG_OPTIMIZE), 0,
+    int(cv2.IMWRITE_JPEG_PROGRESSIVE), 0,
+]
+
+# Kích thước tối thiểu của một JPEG hợp lệ (bytes)
+MIN_JPEG_SIZE = 128
+
+# Content-Type của ảnh gửi dạng raw binary trong body
+RAW_IMAGE_MIMETYPES = ('image/jpeg', 'application/octet-stream')
+
+# Số client /stream tối đa cùng lúc, mỗi client giữ một thread của server
+# suốt thời gian xem; vượt quá sẽ trả về 503
+MAX_STREAM_CLIENTS = 8
+
+# Số thread xử lý request khi chạy bằng waitress: đủ cho MAX_STREAM_CLIENTS
+# client /stream và còn 4 thread cho /upload, /status, /latest
+SERVER_THREADS = MAX_STREAM_CLIENTS + 4
+
+# Sau STREAM_KEEPALIVE giây không có frame mới, /stream gửi lại dữ liệu để
+# server phát hiện client đã ngắt kết nối và trả thread về pool
+STREAM_KEEPALIVE = 5.0
+
+# Font chữ vẽ trên frame
+FONT = cv2.FONT_HERSHEY_SIMPLEX
 
 # Tạo thư mục static nếu chưa có
 os.makedirs(STATIC_DIR, exist_ok=True)
@@ -57,44 +97,329 @@ except AttributeError:
 if face_cascade is None or face_cascade.empty():
     raise Exception("❌ Failed to load Haar Cascade classifier!")
 
-# Biến toàn cục lưu frame mới nhất
-latest_frame = None
-latest_detected_frame = None
+# Bật OpenCL (T-API) nếu máy có GPU/iGPU hỗ trợ, dùng cho Haar Cascade
+use_opencl = cv2.ocl.haveOpenCL()
+if use_opencl:
+    cv2.ocl.setUseOpenCL(True)
+    use_opencl = cv2.ocl.useOpenCL()
+    if use_opencl:
+        print("✅ OpenCL enabled for face detection")
+
+# Load YuNet (OpenCV DNN) nếu có file model, nhanh và chính xác hơn Haar Cascade
+# Tải model tại: https://github.com/opencv/opencv_zoo/tree/main/models/face_detection_yunet
+face_detector = None
+yunet_path = os.path.join(STATIC_DIR, 'face_detection_yunet_2023mar.onnx')
+
+if hasattr(cv2, 'FaceDetectorYN') and os.path.exists(yunet_path):
+    try:
+        face_detector = cv2.FaceDetectorYN.create(
+            yunet_path, '', (320, 240),
+            score_threshold=0.7,
+            nms_threshold=0.3,
+            top_k=50,
+            backend_id=cv2.dnn.DNN_BACKEND_OPENCV,
+            target_id=cv2.dnn.DNN_TARGET_CPU
+        )
+        # Chạy thử một lần: model 2023mar cần OpenCV >= 4.8, bản cũ hơn vẫn
+        # create() được nhưng detect() lỗi, nên kiểm tra ngay để dùng Haar Cascade
+        face_detector.detect(np.zeros((240, 320, 3), dtype=np.uint8))
+        print(f"✅ Loaded YuNet face detector from: {yunet_path}")
+    except cv2.error as e:
+        print(f"⚠️  Failed to load YuNet, using Haar Cascade: {e}")
+        face_detector = None
+
+# Kết quả nhận diện gần nhất, dùng lại cho các frame bị bỏ qua
+last_faces = None
+last_detection_time = 0.0
+frames_since_detection = 0
+
+# Số khuôn mặt của frame xử lý gần nhất và thời điểm xử lý, trả về qua /status
+last_faces_count = None
+last_result_time = None
+
+# Timestamp vẽ trên frame, chỉ format lại mỗi giây
+timestamp_sec = 0
+timestamp_str = ''
+
+
+class FrameBroker:
+    """
+    Giữ JPEG mới nhất đã nhận diện và đánh thức các client đang xem stream
+    
+    Mỗi frame chỉ được encode một lần khi upload, tất cả client /stream
+    dùng chung cùng một buffer thay vì tự encode lại.
+    """
+    
+    def __init__(self):
+        self.frame = None
+        self.frame_id = 0
+        self.cond = threading.Condition()
+    
+    def set(self, jpeg_bytes):
+        """Cập nhật frame mới và báo cho tất cả client đang chờ"""
+        with self.cond:
+            self.frame = jpeg_bytes
+            self.frame_id += 1
+            self.cond.notify_all()
+    
+    def wait(self, last_id, timeout=None):
+        """
+        Chờ đến khi có frame mới hơn last_id
+        
+        Returns:
+            (frame_id, frame): frame_id không đổi nếu hết timeout
+        """
+        with self.cond:
+            self.cond.wait_for(lambda: self.frame_id != last_id, timeout)
+            return self.frame_id, self.frame
+
+
+broker = FrameBroker()
 
+# Giới hạn số client /stream đang mở
+stream_slots = threading.BoundedSemaphore(MAX_STREAM_CLIENTS)
 
-def detect_faces(image):
+
+def find_faces(image):
     """
-    Nhận diện khuôn mặt trong ảnh và vẽ khung hình chữ nhật
+    Tìm khuôn mặt bằng YuNet nếu đã load, ngược lại dùng Haar Cascade
     
     Args:
-        image: numpy array của ảnh (BGR format)
+        image: numpy array của ảnh (BGR, hoặc ảnh xám khi dùng Haar Cascade)
     
     Returns:
-        image: ảnh đã vẽ khung hình
-        faces_count: số khuôn mặt phát hiện được
+        faces: mảng (x, y, w, h) của các khuôn mặt
     """
-    # Chuyển sang grayscale để nhận diện
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    if face_detector is not None:
+        h, w = image.shape[:2]
+        # Chỉ thread detection_worker gọi tới đây nên dùng chung một detector,
+        # đổi input size không cần khóa
+        face_detector.setInputSize((w, h))
+        _, faces = face_detector.detect(image)
+        if faces is None:
+            return np.empty((0, 4), dtype=int)
+        return faces[:, :4].astype(int)
     
-    # Nhận diện khuôn mặt
-    faces = face_cascade.detectMultiScale(
+    # Chuyển sang grayscale (nếu cần) và cân bằng histogram để giữ độ nhạy
+    if isinstance(image, np.ndarray) and image.ndim == 3:
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    else:
+        gray = image
+    gray = cv2.equalizeHist(gray)
+    
+    # Chỉ thread detection_worker gọi tới đây nên dùng chung một cascade
+    return face_cascade.detectMultiScale(
         gray,
-        scaleFactor=1.1,
-        minNeighbors=5,
-        minSize=(30, 30)
+        scaleFactor=1.2,
+        minNeighbors=4,
+        minSize=(24, 24),
+        maxSize=(160, 160),
+        flags=cv2.CASCADE_SCALE_IMAGE
     )
+
+
+# Buffer chứa ảnh đã thu nhỏ, dùng lại giữa các frame
+resize_buffer = None
+
+
+def resize_for_detection(image, scale):
+    """Thu nhỏ ảnh vào buffer dùng lại thay vì cấp phát mảng mới mỗi frame"""
+    global resize_buffer
+    
+    h, w = image.shape[:2]
+    size = (round(w * scale), round(h * scale))
+    shape = (size[1], size[0]) + image.shape[2:]
+    
+    # Chỉ thread detection_worker gọi tới đây nên dùng chung một buffer
+    if (resize_buffer is None or resize_buffer.shape != shape
+            or resize_buffer.dtype != image.dtype):
+        resize_buffer = np.empty(shape, dtype=image.dtype)
+    
+    return cv2.resize(image, size, dst=resize_buffer, interpolation=cv2.INTER_AREA)
+
+
+def locate_faces(image):
+    """
+    Thu nhỏ ảnh, nhận diện và trả về vị trí khuôn mặt theo tọa độ ảnh đầu vào
+    
+    Args:
+        image: numpy array của ảnh (BGR, hoặc ảnh xám khi dùng Haar Cascade)
+    
+    Returns:
+        faces: mảng (x, y, w, h) của các khuôn mặt
+    """
+    # Thu nhỏ ảnh về DETECTION_WIDTH để giảm chi phí nhận diện
+    scale = min(1.0, DETECTION_WIDTH / image.shape[1])
+    
+    # Có OpenCL: resize, equalizeHist và detectMultiScale chạy trên GPU qua UMat
+    # (chỉ áp dụng cho ảnh xám của Haar Cascade)
+    if use_opencl and face_detector is None and image.ndim == 2:
+        image = cv2.UMat(image)
+    
+    if scale < 1.0 and isinstance(image, cv2.UMat):
+        small = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    elif scale < 1.0:
+        small = resize_for_detection(image, scale)
+    else:
+        small = image
+    
+    # Nhận diện khuôn mặt
+    faces = find_faces(small)
+    
+    # Đưa tọa độ về kích thước ảnh gốc
+    if len(faces) and scale < 1.0:
+        faces = (faces / scale).astype(int)
+    
+    return faces
+
+
+def detection_due():
+    """Kiểm tra frame hiện tại có cần chạy nhận diện đầy đủ hay dùng lại kết quả cũ"""
+    return (last_faces is None
+            or frames_since_detection + 1 >= DETECT_EVERY_N_FRAMES
+            or time.monotonic() - last_detection_time > DETECTION_MAX_AGE)
+
+
+def current_timestamp():
+    """Chuỗi thời gian hiện tại, chỉ format lại khi sang giây mới"""
+    global timestamp_sec, timestamp_str
+    
+    now = int(time.time())
+    if now != timestamp_sec:
+        timestamp_sec = now
+        timestamp_str = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now))
+    return timestamp_str
+
+
+def draw_faces(image, faces):
+    """
+    Vẽ khung hình chữ nhật quanh các khuôn mặt và thông tin số lượng, thời gian
+    
+    Args:
+        image: numpy array của ảnh (BGR format), được vẽ trực tiếp
+        faces: mảng (x, y, w, h) của các khuôn mặt
     
-    # Vẽ khung hình chữ nhật xung quanh mỗi khuôn mặt
-    for (x, y, w, h) in faces:
-        cv2.rectangle(image, (x, y), (x+w, y+h), (0, 255, 0), 2)
-        cv2.putText(image, 'Face', (x, y-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+    Returns:
+        image: ảnh đã vẽ khung hình
+    """
+    # Vẽ tất cả khung hình chữ nhật bằng một lần gọi polylines
+    if len(faces):
+        x, y, w, h = np.asarray(faces, dtype=np.int32).T
+        pts = np.stack([
+            np.stack([x, y], axis=1),
+            np.stack([x + w, y], axis=1),
+            np.stack([x + w, y + h], axis=1),
+            np.stack([x, y + h], axis=1),
+        ], axis=1)
+        cv2.polylines(image, pts, isClosed=True, color=(0, 255, 0), thickness=2)
+        
+        for fx, fy in zip(x, y):
+            cv2.putText(image, 'Face', (int(fx), int(fy) - 10), FONT, 0.5, (0, 255, 0), 2)
     
     # Thêm thông tin số khuôn mặt và timestamp
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    cv2.putText(image, f'Faces: {len(faces)} | {timestamp}', (10, 30), 
-                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
+    cv2.putText(image, f'Faces: {len(faces)} | {current_timestamp()}', (10, 30), 
+                FONT, 0.7, (0, 255, 255), 2)
+    
+    return image
+
+
+def process_frame(image_bytes):
+    """
+    Nhận diện khuôn mặt trong JPEG từ ESP32-CAM và cập nhật frame cho /stream
+    
+    Nhận diện chạy trên ảnh decode ở 1/2 độ phân giải (IMREAD_REDUCED_*_2, IDCT
+    thu nhỏ của libjpeg), không cần decode đủ kích thước chỉ để nhận diện.
+    
+    - Không có khuôn mặt: gửi thẳng JPEG gốc của ESP32-CAM lên stream, bỏ qua
+      decode ảnh màu, vẽ và encode lại.
+    - Có khuôn mặt: decode ảnh màu đủ độ phân giải, nhân tọa độ lên
+      DETECTION_DECODE_SCALE rồi vẽ khung và encode, nên frame trên /stream và
+      /latest luôn giữ kích thước ảnh gốc dù có khuôn mặt hay không.
+    
+    Returns:
+        faces_count: số khuôn mặt, hoặc None nếu không decode được ảnh
+    """
+    global last_faces, last_detection_time, frames_since_detection
+    
+    nparr = np.frombuffer(image_bytes, np.uint8)
+    
+    if detection_due():
+        if face_detector is None:
+            # Haar Cascade chỉ cần kênh sáng: decode thẳng JPEG sang ảnh xám
+            # (bỏ qua upsample chroma và YCbCr->BGR) thay vì cvtColor ảnh màu
+            src = cv2.imdecode(nparr, cv2.IMREAD_REDUCED_GRAYSCALE_2)
+        else:
+            # YuNet cần ảnh màu
+            src = cv2.imdecode(nparr, cv2.IMREAD_REDUCED_COLOR_2)
+        if src is None:
+            return None
+        
+        faces = locate_faces(src)
+        last_faces = faces
+        last_detection_time = time.monotonic()
+        frames_since_detection = 0
+    else:
+        # Dùng lại kết quả cũ vì vừa nhận diện cách đây ít frame
+        faces = last_faces
+        frames_since_detection += 1
+    
+    # Không có khuôn mặt: không cần vẽ gì, dùng luôn JPEG gốc
+    if len(faces) == 0:
+        broker.set(bytes(image_bytes))
+        return 0
+    
+    # Decode đủ độ phân giải để frame có khuôn mặt cùng kích thước với frame gốc
+    image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    if image is None:
+        return None
+    
+    # Vẽ trực tiếp lên ảnh (imdecode đã cấp buffer riêng nên không cần copy),
+    # tọa độ nhận diện ở 1/2 độ phân giải nên nhân ngược lại
+    draw_faces(image, np.asarray(faces) * DETECTION_DECODE_SCALE)
     
-    return image, len(faces)
+    # Encode JPEG một lần duy nhất cho tất cả client đang xem stream
+    ret, buffer = cv2.imencode('.jpg', image, JPEG_ENCODE_PARAMS)
+    if ret:
+        broker.set(buffer.tobytes())
+    
+    return len(faces)
+
+
+# Hàng đợi ảnh chờ nhận diện, chỉ giữ 2 frame mới nhất
+frame_queue = queue.Queue(maxsize=2)
+
+
+def enqueue_frame(image_bytes):
+    """Đưa ảnh vào hàng đợi, nếu đầy thì bỏ frame cũ nhất"""
+    while True:
+        try:
+            frame_queue.put_nowait(image_bytes)
+            return
+        except queue.Full:
+            try:
+                frame_queue.get_nowait()
+            except queue.Empty:
+                pass
+
+
+def detection_worker():
+    """Thread nền xử lý lần lượt các ảnh trong frame_queue"""
+    global last_faces_count, last_result_time
+    
+    while True:
+        image_bytes = frame_queue.get()
+        try:
+            faces_count = process_frame(image_bytes)
+            if faces_count is None:
+                print("⚠️  Could not decode image")
+            else:
+                last_faces_count = faces_count
+                last_result_time = current_timestamp()
+        except Exception as e:
+            print(f"❌ Detection error: {e}")
+
+
+threading.Thread(target=detection_worker, daemon=True).start()
 
 
 @app.route('/')
@@ -107,55 +432,53 @@ def index():
 def upload_image():
     """
     Endpoint nhận ảnh từ ESP32-CAM
-    ESP32-CAM có thể gửi ảnh theo 2 cách:
-    1. Base64: {'image': 'base64_encoded_string'}
-    2. Binary: gửi trực tiếp file trong form-data hoặc raw body
-    """
-    global latest_frame, latest_detected_frame
+    ESP32-CAM có thể gửi ảnh theo các cách sau (chọn theo Content-Type):
+    1. Binary (khuyến nghị): raw body với image/jpeg hoặc application/octet-stream
+    2. Base64: application/json {'image': 'base64_encoded_string'}
+    3. File trong multipart/form-data (field 'file')
     
+    Ảnh chỉ được đưa vào hàng đợi và trả về 202 ngay, việc decode và nhận
+    diện chạy trên detection_worker. Kết quả xem qua /stream, /latest, /status.
+    """
     try:
-        image = None
+        image_bytes = None
+        content_type = request.mimetype
+        
+        # Cách 1: Raw binary JPEG, đọc thẳng body (không parse form, không cache)
+        if content_type in RAW_IMAGE_MIMETYPES:
+            image_bytes = request.get_data(cache=False)
         
-        # Cách 1: Nhận ảnh dưới dạng base64 từ JSON
-        if request.is_json:
-            data = request.get_json()
+        # Cách 2: Nhận ảnh dưới dạng base64 từ JSON (chậm hơn: JSON + base64 lớn hơn 33%)
+        elif content_type == 'application/json':
+            data = request.get_json(silent=True) or {}
             if 'image' in data:
                 # Decode base64
-                image_data = base64.b64decode(data['image'])
-                nparr = np.frombuffer(image_data, np.uint8)
-                image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+                image_bytes = base64.b64decode(data['image'])
         
-        # Cách 2: Nhận ảnh dưới dạng file upload
+        # Cách 3: Nhận ảnh dưới dạng file upload
         elif 'file' in request.files:
             file = request.files['file']
             image_bytes = file.read()
-            nparr = np.frombuffer(image_bytes, np.uint8)
-            image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
         
-        # Cách 3: Nhận ảnh dưới dạng raw binary data
+        # Content-Type khác: coi body là raw binary data
         else:
-            image_bytes = request.data
-            nparr = np.frombuffer(image_bytes, np.uint8)
-            image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+            image_bytes = request.get_data(cache=False)
         
-        if image is None:
-            return jsonify({'status': 'error', 'message': 'Could not decode image'}), 400
+        if not image_bytes:
+            return jsonify({'status': 'error', 'message': 'No image data'}), 400
         
-        # Lưu frame gốc
-        latest_frame = image.copy()
+        # Kiểm tra nhanh marker SOI/EOI, loại bỏ request rỗng/bị cắt trước khi decode
+        if len(image_bytes) < MIN_JPEG_SIZE or image_bytes[:2] != b'\xff\xd8':
+            return jsonify({'status': 'error', 'message': 'Not a JPEG image'}), 400
+        if not image_bytes[-16:].rstrip(b'\x00').endswith(b'\xff\xd9'):
+            return jsonify({'status': 'error', 'message': 'Truncated JPEG image'}), 400
         
-        # Nhận diện khuôn mặt
-        detected_image, faces_count = detect_faces(image)
-        latest_detected_frame = detected_image.copy()
-        
-        # Lưu ảnh đã nhận diện vào static folder
-        cv2.imwrite(DETECTED_IMAGE_PATH, detected_image)
+        enqueue_frame(image_bytes)
         
         return jsonify({
-            'status': 'success',
-            'faces_detected': faces_count,
-            'message': f'Detected {faces_count} face(s)'
-        })
+            'status': 'accepted',
+            'message': 'Image queued for face detection'
+        }), 202
     
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
@@ -163,11 +486,10 @@ def upload_image():
 
 @app.route('/latest')
 def get_latest_image():
-    """API trả về ảnh mới nhất đã nhận diện"""
-    if os.path.exists(DETECTED_IMAGE_PATH):
-        with open(DETECTED_IMAGE_PATH, 'rb') as f:
-            image_data = f.read()
-        return Response(image_data, mimetype='image/jpeg')
+    """API trả về ảnh mới nhất đã nhận diện (lấy từ bộ nhớ, không đọc file)"""
+    frame = broker.frame
+    if frame is not None:
+        return Response(frame, mimetype='image/jpeg')
     else:
         return jsonify({'status': 'error', 'message': 'No image available'}), 404
 
@@ -176,24 +498,34 @@ def get_latest_image():
 def video_stream():
     """
     Endpoint stream video theo định dạng MJPEG
-    Trả về ảnh mới nhất liên tục
+    Chỉ gửi frame khi /upload có ảnh mới (không polling, không encode lại)
     """
+    # Mỗi client giữ một thread, giới hạn để /upload và /status luôn còn thread
+    if not stream_slots.acquire(blocking=False):
+        return jsonify({'status': 'error', 'message': 'Too many stream clients'}), 503
+    
     def generate():
+        # frame_id = 0 nghĩa là chưa có frame; nếu đã có frame thì gửi ngay
+        last_id = 0
         while True:
-            if latest_detected_frame is not None:
-                # Encode frame thành JPEG
-                ret, buffer = cv2.imencode('.jpg', latest_detected_frame)
-                frame = buffer.tobytes()
-                
-                # Trả về frame theo định dạng MJPEG
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
-            else:
-                # Nếu chưa có frame nào, tạm dừng
-                import time
-                time.sleep(0.1)
+            # Hết timeout mà không có frame mới vẫn ghi ra socket (gửi lại frame
+            # cũ) để server phát hiện client đã đóng kết nối
+            last_id, frame = broker.wait(last_id, timeout=STREAM_KEEPALIVE)
+            if frame is None:
+                # Chưa có frame nào: CRLF nằm trong phần preamble của multipart,
+                # trình duyệt bỏ qua
+                yield b'\r\n'
+                continue
+            
+            # Trả về frame theo định dạng MJPEG
+            yield (b'--frame\r\n'
+                   b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
     
-    return Response(generate(), mimetype='multipart/x-mixed-replace; boundary=frame')
+    response = Response(generate(), mimetype='multipart/x-mixed-replace; boundary=frame')
+    # Trả slot khi response đóng (client ngắt hoặc server dừng), kể cả khi
+    # generator chưa chạy lần nào
+    response.call_on_close(stream_slots.release)
+    return response
 
 
 @app.route('/status')
@@ -201,8 +533,10 @@ def status():
     """Kiểm tra trạng thái server"""
     return jsonify({
         'status': 'running',
-        'has_frame': latest_frame is not None,
-        'detected_image_exists': os.path.exists(DETECTED_IMAGE_PATH)
+        'has_frame': broker.frame_id > 0,
+        'detected_image_exists': broker.frame is not None,
+        'faces_detected': last_faces_count,
+        'last_result_time': last_result_time
     })
 
 
@@ -221,5 +555,16 @@ if __name__ == '__main__':
     print(f"   - ESP32 IP: Kiểm tra Serial Monitor")
     print("=" * 60)
     
-    # Chạy server trên tất cả network interfaces
-    app.run(host='0.0.0.0', port=5000, debug=True, threaded=True)
+    # Chạy server trên tất cả network interfaces, ưu tiên waitress (production,
+    # nhiều thread) nếu đã cài, ngược lại dùng dev server của Flask
+    try:
+        from waitress import serve
+    except ImportError:
+        serve = None
+    
+    if serve is not None:
+        print(f"✅ Serving with waitress ({SERVER_THREADS} threads)")
+        serve(app, host='0.0.0.0', port=5000, threads=SERVER_THREADS)
+    else:
+        # Không bật debug: reloader import module 2 lần và làm chậm mỗi request
+        app.run(host='0.0.0.0', port=5000, debug=False, threaded=True)
@@ -174,7 +174,8 @@ void loop() {
  * - HTTPClient POST ảnh binary trực tiếp (fb->buf, fb->len)
  * - Flask nhận binary data qua request.data
  * - OpenCV decode và nhận diện khuôn mặt
- * - Server trả về JSON với số khuôn mặt phát hiện được
+ * - Server trả về JSON 202 ngay khi nhận ảnh; số khuôn mặt phát hiện được
+ *   xem qua GET /status (trường faces_detected)
  * 
  * ALTERNATIVE: Gửi Base64
  * Nếu muốn gửi base64, thêm thư viện Base64 và dùng:
@@ -0,0 +1,15 @@
+"""
+WSGI entry point cho production server
+Chạy bằng một process nhiều thread để FrameBroker và hàng đợi nhận diện
+(lưu trong bộ nhớ) dùng chung cho mọi request:
+
+    gunicorn -w 1 -k gthread --threads 12 -b 0.0.0.0:5000 wsgi:app
+    waitress-serve --threads=12 --port=5000 wsgi:app   (Windows)
+
+Mỗi client /stream giữ một thread suốt thời gian xem. app.py giới hạn
+MAX_STREAM_CLIENTS = 8 client (client thứ 9 nhận 503), nên số thread phải
+lớn hơn MAX_STREAM_CLIENTS (12 = 8 + 4) để /upload và /status luôn còn thread.
+Nếu tăng MAX_STREAM_CLIENTS thì tăng --threads tương ứng.
+"""
+
+from app import app